@@ -18,14 +18,69 @@ st.markdown("Executive dashboard for monitoring supply chain health and performa
 @st.cache_data
 def load_mock_data():
     dates = pd.date_range(start="2024-01-01", periods=90, freq="D")
+    rng = np.random.default_rng(42)
+    # One draw for all three series; per-row bounds broadcast over the columns
+    actual, forecast, inventory = rng.integers(
+        [[100], [100], [50]], [[200], [200], [300]], size=(3, 90)
+    ).astype(np.float32)
     df = pd.DataFrame({
         "Date": dates,
-        "Actual_Demand": np.random.randint(100, 200, size=90),
-        "Forecast_Demand": np.random.randint(100, 200, size=90) * 1.05, # Slight bias for demo
-        "Inventory_Level": np.random.randint(50, 300, size=90)
+        "Actual_Demand": actual,
+        "Forecast_Demand": forecast * np.float32(1.05), # Slight bias for demo
+        "Inventory_Level": inventory
     })
     return df
 
+# Chart downsampling: a chart cannot show more points than it has pixels
+MAX_CHART_POINTS = 2000
+
+def lttb_indices(x, y, n_out):
+    """Row positions kept by Largest-Triangle-Three-Buckets downsampling."""
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    # First and last points are always kept; the rest is split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Third triangle vertex: average of the next bucket (or the last point)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+
+    return keep
+
+def downsample(df, x, ys, max_points=MAX_CHART_POINTS):
+    """Reduce df to roughly max_points rows for plotting, preserving the shape of each series."""
+    if len(df) <= max_points:
+        return df
+
+    x_values = df[x].to_numpy()
+    if np.issubdtype(x_values.dtype, np.datetime64):
+        x_values = x_values.astype(np.int64)
+    x_values = x_values.astype(np.float64)
+
+    per_series = max(max_points // len(ys), 3)
+    keep = np.unique(np.concatenate([
+        lttb_indices(x_values, df[col].to_numpy(np.float64), per_series) for col in ys
+    ]))
+    return df.iloc[keep]
+
 data = load_mock_data()
 
 # KPI Section
@@ -47,7 +102,8 @@ col_left, col_right = st.columns(2)
 
 with col_left:
     st.subheader("Demand vs. Forecast")
-    fig_demand = px.line(data, x="Date", y=["Actual_Demand", "Forecast_Demand"], 
+    demand_chart_data = downsample(data, "Date", ["Actual_Demand", "Forecast_Demand"])
+    fig_demand = px.line(demand_chart_data, x="Date", y=["Actual_Demand", "Forecast_Demand"], 
                          title="Daily Demand Tracking",
                          labels={"value": "Units", "variable": "Metric"},
                          color_discrete_map={"Actual_Demand": "blue", "Forecast_Demand": "orange"})
@@ -55,7 +111,8 @@ with col_left:
 
 with col_right:
     st.subheader("Inventory Levels")
-    fig_inv = px.area(data, x="Date", y="Inventory_Level", 
+    inventory_chart_data = downsample(data, "Date", ["Inventory_Level"])
+    fig_inv = px.area(inventory_chart_data, x="Date", y="Inventory_Level", 
                       title="Inventory Position Over Time",
                       labels={"Inventory_Level": "Units"},
                       color_discrete_sequence=["green"])
@@ -19,15 +19,93 @@ Thresholds:
 
 import pandas as pd
 import numpy as np
+import pyarrow.dataset as ds
 import pyarrow.parquet as pq
 from pathlib import Path
+from typing import Optional, Tuple
+import importlib.util
 import logging
+import os
 import matplotlib.pyplot as plt
 import seaborn as sns
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Gold-layer size above which main() aggregates in parallel with Dask (if installed)
+DASK_MIN_BYTES = 1 << 30
+
+# Streamed partial sums are buffered and merged this many batches at a time, so the
+# running totals are re-grouped once per merge rather than once per batch
+STREAM_COMBINE_BATCHES = 16
+
+
+# Same encoding as kmeans_segmenter._factorize_keys, kept as a copy on purpose:
+# src/analytics and src/clustering are run as separate scripts and cannot import
+# from each other. Keep the (item_id, store_id) order and return type in sync.
+def _factorize_store_item(item_id: pd.Series, store_id: pd.Series) -> Tuple[np.ndarray, pd.MultiIndex]:
+    """Map each (item_id, store_id) pair to a dense integer code.
+
+    Returns the per-row codes and a MultiIndex with the key for each code.
+    Rows with a missing ID get code -1, matching groupby's default of dropping them.
+    """
+    item_codes, items = pd.factorize(item_id)
+    store_codes, stores = pd.factorize(store_id)
+    width = max(len(stores), 1)
+    valid = (item_codes >= 0) & (store_codes >= 0)
+    codes = np.full(len(item_codes), -1, dtype=np.int64)
+    codes[valid], pairs = pd.factorize(item_codes[valid].astype(np.int64) * width + store_codes[valid])
+    index = pd.MultiIndex.from_arrays(
+        [items.take(pairs // width), stores.take(pairs % width)],
+        names=['item_id', 'store_id']
+    )
+    return codes, index
+
+
+def _key_frame(index: pd.MultiIndex) -> pd.DataFrame:
+    """Store-item key columns, in output order, for the codes of _factorize_store_item."""
+    return pd.DataFrame({
+        'store_id': index.get_level_values('store_id'),
+        'item_id': index.get_level_values('item_id')
+    })
+
+
+def _partial_stats(df: pd.DataFrame) -> pd.DataFrame:
+    """Additive per store-item sums of daily sales for one chunk of rows.
+
+    Partial results for separate chunks combine by summing rows with the same key.
+    """
+    # Encode item-store pairs as dense integer codes once; every statistic
+    # below is then a weighted bincount over the codes, with no groupby hashing
+    codes, index = _factorize_store_item(df['item_id'], df['store_id'])
+    stats = _key_frame(index)
+    n_groups = len(stats)
+    
+    keyed = codes >= 0
+    codes = codes[keyed]
+    sales = np.nan_to_num(df['total_sales'].to_numpy(np.float64)[keyed])
+    is_nz = sales > 0
+    nz_sales = np.where(is_nz, sales, 0.0)
+    
+    stats['total_demand'] = np.bincount(codes, weights=sales, minlength=n_groups)
+    stats['num_observations'] = np.bincount(codes, minlength=n_groups)
+    stats['non_zero_obs'] = np.bincount(codes[is_nz], minlength=n_groups)
+    stats['nz_sum'] = np.bincount(codes, weights=nz_sales, minlength=n_groups)
+    stats['nz_sumsq'] = np.bincount(codes, weights=nz_sales * nz_sales, minlength=n_groups)
+    return stats
+
+
+def _combine_partial_stats(partials: list) -> pd.DataFrame:
+    """Merge partial store-item sums from several chunks into one row per key."""
+    combined = pd.concat(partials, ignore_index=True)
+    codes, index = _factorize_store_item(combined['item_id'], combined['store_id'])
+    totals = _key_frame(index)
+    for col in combined.columns.drop(['store_id', 'item_id']):
+        values = combined[col].to_numpy()
+        totals[col] = np.bincount(codes, weights=values, minlength=len(totals)).astype(values.dtype)
+    return totals
+
+
 class DemandClassifier:
     
     def __init__(self, gold_path: str, output_path: str):
@@ -40,89 +118,134 @@ class DemandClassifier:
         file_path = self.gold_path / 'daily_sales_agg'
         logger.info(f"Loading data from {file_path}")
         
-        # Read parquet
-        df = pq.read_table(file_path).to_pandas()
+        # Read only the columns used downstream; IDs stay dictionary-encoded so
+        # they arrive as pandas categoricals instead of object strings
+        table = pq.read_table(
+            file_path,
+            columns=['date', 'store_id', 'item_id', 'total_sales'],
+            use_threads=True
+        )
+        df = table.to_pandas(
+            categories=['store_id', 'item_id'],
+            split_blocks=True,
+            self_destruct=True
+        )
         return df
     
     def calculate_features(self, df: pd.DataFrame):
         """Calculate ADI and CV² for each item-store combination."""
         logger.info("Calculating demand features...")
         
-        # Filter for relevant columns
-        df = df[['date', 'store_id', 'item_id', 'total_sales']].copy()
+        return self._finalize_features(_partial_stats(df))
+    
+    def calculate_features_streaming(self, batch_size: int = 500_000):
+        """Calculate ADI and CV² by streaming the Gold layer in record batches.
         
-        # Sort by date
-        df = df.sort_values(['store_id', 'item_id', 'date'])
+        Only running per store-item sums are held in memory, so peak memory
+        follows the number of item-stores rather than the number of daily rows.
+        """
+        file_path = self.gold_path / 'daily_sales_agg'
+        logger.info(f"Streaming demand features from {file_path}")
         
-        results = []
+        dataset = ds.dataset(file_path, format='parquet')
+        batches = dataset.to_batches(
+            columns=['store_id', 'item_id', 'total_sales'],
+            batch_size=batch_size
+        )
         
-        # Group by item-store
-        # Note: For performance on large datasets, we might want to use vectorization or Spark
-        # Here we use pandas groupby apply for clarity on the logic
+        partials = []
+        for batch in batches:
+            partials.append(_partial_stats(batch.to_pandas()))
+            if len(partials) > STREAM_COMBINE_BATCHES:
+                partials = [_combine_partial_stats(partials)]
         
-        grouped = df.groupby(['store_id', 'item_id'])
+        if not partials:
+            partials.append(_partial_stats(dataset.schema.empty_table().to_pandas()))
+        totals = _combine_partial_stats(partials)
         
-        stats = grouped.agg(
-            total_demand=('total_sales', 'sum'),
-            num_observations=('date', 'count'),
-            non_zero_obs=('total_sales', lambda x: (x > 0).sum())
-        ).reset_index()
+        return self._finalize_features(totals)
+    
+    def calculate_features_dask(self, n_workers: Optional[int] = None):
+        """Calculate ADI and CV² in parallel over Parquet row groups with Dask.
         
-        # Calculate ADI
-        # ADI = Total Periods / Number of Non-Zero Demand Periods
-        stats['ADI'] = stats['num_observations'] / stats['non_zero_obs']
+        Each partition is reduced to partial store-item sums, which Dask then
+        combines with a tree reduction across worker processes.
+        """
+        import dask.dataframe as dd
         
-        # Calculate CV of non-zero demand
-        # We need std dev of non-zero demands. 
-        # Let's do a separate aggregation for std dev of non-zero
+        file_path = self.gold_path / 'daily_sales_agg'
+        logger.info(f"Computing demand features with Dask from {file_path}")
         
-        non_zero_df = df[df['total_sales'] > 0]
-        nz_stats = non_zero_df.groupby(['store_id', 'item_id'])['total_sales'].agg(['mean', 'std']).reset_index()
-        nz_stats.columns = ['store_id', 'item_id', 'nz_mean', 'nz_std']
+        ddf = dd.read_parquet(
+            file_path,
+            columns=['store_id', 'item_id', 'total_sales'],
+            split_row_groups=True
+        )
+        totals = (
+            ddf.map_partitions(_partial_stats)
+            .groupby(['store_id', 'item_id'], observed=True, sort=False)
+            .sum()
+            .compute(scheduler='processes', num_workers=n_workers or os.cpu_count())
+            .reset_index()
+        )
         
-        # Merge
-        stats = stats.merge(nz_stats, on=['store_id', 'item_id'], how='left')
+        return self._finalize_features(totals)
+    
+    def gold_size_bytes(self) -> int:
+        """On-disk size of the daily sales Gold table (file or partitioned directory)."""
+        file_path = self.gold_path / 'daily_sales_agg'
+        if file_path.is_dir():
+            return sum(f.stat().st_size for f in file_path.rglob('*.parquet'))
+        return file_path.stat().st_size
+    
+    def _finalize_features(self, stats: pd.DataFrame) -> pd.DataFrame:
+        """Derive ADI and CV² from combined per store-item sums."""
+        # Mean and sample std (ddof=1) of non-zero demand from sum and sum of squares
+        nz_n = stats['non_zero_obs'].to_numpy()
+        nz_sum = stats['nz_sum'].to_numpy()
+        nz_sumsq = stats['nz_sumsq'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            nz_mean = nz_sum / nz_n
+            nz_var = (nz_sumsq - nz_n * nz_mean * nz_mean) / (nz_n - 1)
         
         # Handle items with only 1 or 0 non-zero observations (std is NaN)
-        stats['nz_std'] = stats['nz_std'].fillna(0)
-        stats['nz_mean'] = stats['nz_mean'].fillna(0)
-        
+        stats = stats.drop(columns=['nz_sum', 'nz_sumsq'])
+        stats['nz_mean'] = np.nan_to_num(nz_mean, nan=0.0, copy=False)
+        stats['nz_std'] = np.nan_to_num(np.sqrt(np.clip(nz_var, 0, None)), nan=0.0, copy=False)
+
+        # Calculate ADI
+        # ADI = Total Periods / Number of Non-Zero Demand Periods
+        stats['ADI'] = stats['num_observations'] / stats['non_zero_obs']
+
         # Calculate CV²
         # CV = std / mean
         stats['CV'] = stats['nz_std'] / stats['nz_mean']
         stats['CV2'] = stats['CV'] ** 2
         
         # Handle division by zero or NaN
-        stats['CV2'] = stats['CV2'].fillna(0)
+        stats['CV2'] = np.nan_to_num(stats['CV2'].to_numpy(), nan=0.0, posinf=0.0, neginf=0.0)
         
         return stats
     
     def classify_patterns(self, df: pd.DataFrame):
         """Apply classification rules."""
         logger.info("Classifying patterns...")
-        
-        def get_category(row):
-            adi = row['ADI']
-            cv2 = row['CV2']
-            
-            if adi < 1.32:
-                if cv2 < 0.49:
-                    return 'Smooth'
-                else:
-                    return 'Erratic'
-            else:
-                if cv2 < 0.49:
-                    return 'Intermittent'
-                else:
-                    return 'Lumpy'
-                    
-        df['demand_pattern'] = df.apply(get_category, axis=1)
+
+        # 2-bit quadrant index: high bit = intermittent (ADI), low bit = variable (CV²)
+        adi = df['ADI'].to_numpy()
+        cv2 = df['CV2'].to_numpy()
+        idx = (adi >= 1.32).astype(np.uint8) * 2 + (cv2 >= 0.49).astype(np.uint8)
+
+        df['demand_pattern'] = pd.Categorical.from_codes(
+            idx, categories=['Smooth', 'Erratic', 'Intermittent', 'Lumpy']
+        )
         return df
     
     def save_results(self, df: pd.DataFrame):
         """Save classification results."""
-        output_file = self.output_path / 'demand_patterns.csv'
-        df.to_csv(output_file, index=False)
+        # Parquet keeps dtypes and dictionary-encodes the categorical pattern column
+        output_file = self.output_path / 'demand_patterns.parquet'
+        df.to_parquet(output_file, engine='pyarrow', compression='snappy', index=False)
         logger.info(f"Saved results to {output_file}")
         
         # Also save summary
@@ -130,6 +253,10 @@ class DemandClassifier:
         summary.columns = ['Pattern', 'Count']
         summary['Percentage'] = summary['Count'] / summary['Count'].sum()
         
+        summary_file = self.output_path / 'demand_pattern_summary.csv'
+        summary.to_csv(summary_file, index=False)
+        logger.info(f"Saved summary to {summary_file}")
+        
         print("\nDemand Pattern Summary:")
         print(summary)
         
@@ -163,8 +290,11 @@ def main():
     classifier = DemandClassifier(GOLD_PATH, OUTPUT_PATH)
     
     try:
-        df = classifier.load_data()
-        features = classifier.calculate_features(df)
+        # Large tables are spread across cores with Dask; otherwise stream in one process
+        if classifier.gold_size_bytes() > DASK_MIN_BYTES and importlib.util.find_spec('dask'):
+            features = classifier.calculate_features_dask()
+        else:
+            features = classifier.calculate_features_streaming()
         classified = classifier.classify_patterns(features)
         classifier.save_results(classified)
         classifier.plot_quadrant(classified)
@@ -177,14 +307,15 @@ def main():
         logger.warning("Could not load real data. Generating dummy data for demonstration.")
         
         # Generate dummy data
-        np.random.seed(42)
+        rng = np.random.default_rng(42)
         n_items = 1000
+        adi, cv2 = rng.uniform([[1.0], [0.1]], [[2.0], [1.0]], size=(2, n_items))
         
         dummy_data = pd.DataFrame({
             'store_id': ['S1'] * n_items,
             'item_id': [f'I{i}' for i in range(n_items)],
-            'ADI': np.random.uniform(1.0, 2.0, n_items),
-            'CV2': np.random.uniform(0.1, 1.0, n_items)
+            'ADI': adi,
+            'CV2': cv2
         })
         
         classified = classifier.classify_patterns(dummy_data)
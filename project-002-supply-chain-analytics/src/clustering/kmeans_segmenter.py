@@ -14,7 +14,7 @@ combinations into 8-12 distinct clusters based on:
 
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import silhouette_score, davies_bouldin_score
 from typing import Dict, Tuple, Optional
@@ -22,9 +22,95 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import logging
 
+try:
+    import polars as pl
+except ImportError:  # optional: prepare_features falls back to pandas
+    pl = None
+
+try:
+    from numba import njit
+except ImportError:  # optional: trend slope falls back to grouped pandas sums
+    njit = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Item-stores per block in the seasonality FFT; bounds the dense (item-store x date)
+# matrix to this many rows at a time
+SEASONALITY_BLOCK_GROUPS = 8192
+
+
+# Copied on purpose as analytics/demand_classifier._factorize_store_item, since
+# the two src/ folders cannot import from each other; keep them in sync
+def _factorize_keys(item_id: pd.Series, store_id: pd.Series) -> Tuple[np.ndarray, pd.MultiIndex]:
+    """
+    Encode the (item_id, store_id) pair as dense integer group codes.
+    
+    Each column is factorized on its own and the two codes are combined into
+    a single int64 key, so no Python tuples are built for the composite key.
+    Rows with a missing ID get code -1.
+    """
+    item_codes, items = pd.factorize(item_id)
+    store_codes, stores = pd.factorize(store_id)
+    width = max(len(stores), 1)
+    valid = (item_codes >= 0) & (store_codes >= 0)
+    codes = np.full(len(item_codes), -1, dtype=np.int64)
+    codes[valid], pairs = pd.factorize(item_codes[valid].astype(np.int64) * width + store_codes[valid])
+    index = pd.MultiIndex.from_arrays(
+        [items.take(pairs // width), stores.take(pairs % width)],
+        names=['item_id', 'store_id']
+    )
+    return codes, index
+
+
+def _clean(data):
+    """
+    Replace NaN and ±inf with 0 in a single pass.
+    
+    Returns float32 data with the same labels as the input Series or DataFrame.
+    """
+    values = np.nan_to_num(
+        np.array(data, dtype=np.float32), nan=0.0, posinf=0.0, neginf=0.0, copy=False
+    )
+    if isinstance(data, pd.DataFrame):
+        return pd.DataFrame(values, index=data.index, columns=data.columns)
+    return pd.Series(values, index=data.index, name=data.name)
+
+
+def _grouped_ols_slope(codes: np.ndarray, sales: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    OLS slope of sales against the row index within each group, in one pass.
+    
+    Groups with fewer than 10 observations get a slope of 0. Compiled with
+    Numba when it is installed.
+    """
+    n = np.zeros(n_groups, dtype=np.int64)
+    sx = np.zeros(n_groups)
+    sy = np.zeros(n_groups)
+    sxx = np.zeros(n_groups)
+    sxy = np.zeros(n_groups)
+    
+    for i in range(codes.shape[0]):
+        g = codes[i]
+        x = float(n[g])
+        y = sales[i]
+        sx[g] += x
+        sy[g] += y
+        sxx[g] += x * x
+        sxy[g] += x * y
+        n[g] += 1
+    
+    slopes = np.zeros(n_groups)
+    for g in range(n_groups):
+        if n[g] >= 10:
+            slopes[g] = (n[g] * sxy[g] - sx[g] * sy[g]) / (n[g] * sxx[g] - sx[g] * sx[g])
+    
+    return slopes
+
+
+if njit is not None:
+    _grouped_ols_slope = njit(cache=True)(_grouped_ols_slope)
+
 
 class InventorySegmentation:
     """
@@ -37,7 +123,8 @@ class InventorySegmentation:
     def __init__(
         self,
         n_clusters: int = 8,
-        random_state: int = 42
+        random_state: int = 42,
+        use_gpu: bool = False
     ):
         """
         Initialize inventory segmentation.
@@ -48,9 +135,12 @@ class InventorySegmentation:
             Number of clusters (8-12 recommended)
         random_state : int, default=42
             Random seed for reproducibility
+        use_gpu : bool, default=False
+            Fit and predict with RAPIDS cuML on the GPU (requires cuml and cudf)
         """
         self.n_clusters = n_clusters
         self.random_state = random_state
+        self.use_gpu = use_gpu
         self.scaler = StandardScaler()
         self.kmeans = None
         self.feature_names = None
@@ -73,72 +163,185 @@ class InventorySegmentation:
         """
         logger.info("Preparing clustering features...")
         
-        features = pd.DataFrame()
+        df = df.assign(
+            sales=pd.to_numeric(df['sales'], downcast='float'),
+            revenue=pd.to_numeric(df['revenue'], downcast='float')
+        )
         
-        # Feature 1: Annual revenue contribution (ABC classification)
-        features['revenue_contribution'] = df.groupby(['item_id', 'store_id'])['revenue'].sum()
+        # Hash the item-store key once; every feature below groups on the
+        # resulting int code (_gid) and rows are labelled with the key at the end
+        codes, index = _factorize_keys(df['item_id'], df['store_id'])
+        df = df.assign(_gid=codes)
+        if (codes < 0).any():
+            df = df[codes >= 0]
+        n_groups = len(index)
         
-        # Feature 2: Demand coefficient of variation (XYZ classification)
-        demand_stats = df.groupby(['item_id', 'store_id'])['sales'].agg(['mean', 'std'])
-        features['demand_cv'] = demand_stats['std'] / demand_stats['mean']
-        features['demand_cv'] = features['demand_cv'].fillna(0).replace([np.inf, -np.inf], 0)
+        # Features 1, 2, 4 and 5 are aggregations over the same item-store key
+        if pl is not None:
+            features = self._aggregate_features_polars(df)
+        else:
+            features = self._aggregate_features_pandas(df, n_groups)
         
         # Feature 3: Seasonality strength (FFT analysis)
-        features['seasonality_strength'] = self._calculate_seasonality_strength(df)
-        
-        # Feature 4: Trend slope (linear regression)
-        features['trend_slope'] = self._calculate_trend_slope(df)
-        
-        # Feature 5: Stockout frequency
-        features['stockout_frequency'] = self._calculate_stockout_frequency(df)
+        features.insert(2, 'seasonality_strength', self._calculate_seasonality_strength(df, n_groups))
+        features.index = index
         
         # Feature 6: Supplier reliability score (mock - would come from data)
         features['supplier_reliability'] = np.random.uniform(0.7, 1.0, size=len(features))
         
         # Clean features
-        features = features.fillna(0)
-        features = features.replace([np.inf, -np.inf], 0)
+        features = _clean(features)
         
         logger.info(f"Prepared {len(features):,} SKU-store combinations")
         logger.info(f"Features: {list(features.columns)}")
         
         return features
     
-    def _calculate_seasonality_strength(self, df: pd.DataFrame) -> pd.Series:
+    def _aggregate_features_polars(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Compute the aggregated features in a single Polars lazy query.
+        
+        One group_by over the item-store code carries every aggregation, and
+        the work is spread across all cores. Rows are returned in ``_gid`` order.
+        """
+        ldf = pl.from_pandas(df[['_gid', 'revenue', 'sales']]).lazy().with_columns(
+            # Row index within each item-store group (x for the trend regression)
+            pl.int_range(pl.len()).over('_gid').cast(pl.Float64).alias('_x')
+        )
+        
+        n, sx, sy = pl.col('_n'), pl.col('_sx'), pl.col('_sy')
+        sxx, sxy = pl.col('_sxx'), pl.col('_sxy')
+        
+        feat = (
+            ldf.group_by('_gid')
+            .agg([
+                pl.col('revenue').sum().alias('revenue_contribution'),
+                pl.col('sales').mean().alias('_m'),
+                pl.col('sales').std().alias('_s'),
+                (pl.col('sales') == 0).cast(pl.Float64).mean().alias('stockout_frequency'),
+                pl.len().alias('_n'),
+                pl.col('_x').sum().alias('_sx'),
+                pl.col('sales').sum().alias('_sy'),
+                (pl.col('_x') * pl.col('_x')).sum().alias('_sxx'),
+                (pl.col('_x') * pl.col('sales')).sum().alias('_sxy')
+            ])
+            .with_columns(
+                (pl.col('_s') / pl.col('_m')).alias('demand_cv'),
+                pl.when(n >= 10)
+                    .then((n * sxy - sx * sy) / (n * sxx - sx * sx))
+                    .otherwise(0.0).alias('_slope')
+            )
+            .with_columns(
+                (pl.col('_slope') / (pl.col('_slope').abs().max() + 1e-10)).alias('trend_slope')
+            )
+            .select(['_gid', 'revenue_contribution', 'demand_cv', 'trend_slope', 'stockout_frequency'])
+            .sort('_gid')
+            .collect()
+        )
+        
+        return feat.to_pandas().set_index('_gid')
+    
+    def _aggregate_features_pandas(self, df: pd.DataFrame, n_groups: int) -> pd.DataFrame:
+        """
+        Compute the aggregated features with pandas groupbys (used when Polars is not installed).
+        """
+        features = pd.DataFrame(index=pd.RangeIndex(n_groups, name='_gid'))
+        grouped = df.groupby('_gid', sort=False)
+        
+        # Feature 1: Annual revenue contribution (ABC classification)
+        features['revenue_contribution'] = grouped['revenue'].sum()
+        
+        # Feature 2: Demand coefficient of variation (XYZ classification)
+        demand_stats = grouped['sales'].agg(['mean', 'std'])
+        features['demand_cv'] = _clean(demand_stats['std'] / demand_stats['mean'])
+        
+        # Feature 4: Trend slope (linear regression)
+        features['trend_slope'] = self._calculate_trend_slope(df, n_groups)
+        
+        # Feature 5: Stockout frequency
+        features['stockout_frequency'] = self._calculate_stockout_frequency(df)
+        
+        return features
+    
+    def _calculate_seasonality_strength(self, df: pd.DataFrame, n_groups: int) -> pd.Series:
         """
         Calculate seasonality strength using FFT.
         
+        Sales are laid out as an (item-store x date) matrix and transformed with
+        a batched real FFT, SEASONALITY_BLOCK_GROUPS item-stores at a time so
+        peak memory does not grow with the number of item-stores. Strength is
+        the largest non-DC magnitude as a share of the total spectral magnitude.
+        
         Returns value between 0 (no seasonality) and 1 (strong seasonality).
         """
-        # Simplified implementation - in production, use FFT
-        seasonal_cv = df.groupby(['item_id', 'store_id', df['date'].dt.month])['sales'].mean().groupby(level=[0, 1]).std()
-        overall_mean = df.groupby(['item_id', 'store_id'])['sales'].mean()
-        seasonality = (seasonal_cv / overall_mean).fillna(0)
+        from scipy.fft import rfft
+        
+        # Column position of each row's date, in calendar order
+        date_codes, dates = pd.factorize(df['date'], sort=True)
+        n_dates = len(dates)
+        if n_dates < 3:
+            return pd.Series(0.0, index=pd.RangeIndex(n_groups, name='_gid'))
+        
+        # Rows without a date (code -1) are dropped, as the pivot on date dropped them
+        dated = date_codes >= 0
+        gid = df['_gid'].to_numpy()[dated]
+        date_codes = date_codes[dated]
+        sales = df['sales'].to_numpy(np.float64)[dated]
+
+        # Sort rows by group so each block of groups is one contiguous slice
+        order = np.argsort(gid, kind='stable')
+        gid = gid[order]
+        date_codes = date_codes[order]
+        sales = sales[order]
+        
+        strength = np.empty(n_groups, dtype=np.float32)
+        block_starts = np.arange(0, n_groups, SEASONALITY_BLOCK_GROUPS)
+        row_bounds = np.searchsorted(gid, np.append(block_starts, n_groups))
+        for start, lo, hi in zip(block_starts, row_bounds[:-1], row_bounds[1:]):
+            n_block = min(SEASONALITY_BLOCK_GROUPS, n_groups - start)
+            cells = (gid[lo:hi] - start) * n_dates + date_codes[lo:hi]
+            matrix = np.bincount(
+                cells, weights=sales[lo:hi], minlength=n_block * n_dates
+            ).reshape(n_block, n_dates).astype(np.float32)
+            
+            spectrum = np.abs(rfft(matrix, axis=1, workers=-1))
+            strength[start:start + n_block] = spectrum[:, 1:].max(axis=1) / (spectrum.sum(axis=1) + 1e-9)
         
-        return seasonality.clip(0, 1)
+        return pd.Series(strength, index=pd.RangeIndex(n_groups, name='_gid')).clip(0, 1)
     
-    def _calculate_trend_slope(self, df: pd.DataFrame) -> pd.Series:
+    def _calculate_trend_slope(self, df: pd.DataFrame, n_groups: int) -> pd.Series:
         """
         Calculate trend slope using linear regression.
         
         Returns slope coefficient normalized to [-1, 1].
         """
-        from scipy.stats import linregress
-        
-        def calculate_slope(group):
-            if len(group) < 10:
-                return 0
-            x = np.arange(len(group))
-            y = group['sales'].values
-            slope, _, _, _, _ = linregress(x, y)
-            return slope
-        
-        slopes = df.groupby(['item_id', 'store_id']).apply(calculate_slope)
-        
-        # Normalize slopes
-        slopes = slopes / (slopes.abs().max() + 1e-10)
+        if njit is not None:
+            codes = df['_gid'].to_numpy()
+            sales = df['sales'].to_numpy(np.float64)
+            slopes = pd.Series(
+                _grouped_ols_slope(codes, sales, n_groups),
+                index=pd.RangeIndex(n_groups, name='_gid')
+            )
+        else:
+            # Closed-form OLS per group from grouped sums, with x = row index within group:
+            # slope = (n·Σxy − Σx·Σy) / (n·Σx² − (Σx)²)
+            gid = df['_gid']
+            x = df.groupby('_gid', sort=False).cumcount().astype(np.float64)
+            y = df['sales']
+            
+            n = x.groupby(gid, sort=False).size()
+            sx = x.groupby(gid, sort=False).sum()
+            sy = y.groupby(gid, sort=False).sum()
+            sxx = (x * x).groupby(gid, sort=False).sum()
+            sxy = (x * y).groupby(gid, sort=False).sum()
+            
+            slopes = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+            slopes = slopes.where(n >= 10, 0)
+
+        # Normalize slopes (cleaned first so a non-finite slope cannot poison the max)
+        slopes = _clean(slopes)
         
-        return slopes.fillna(0)
+        return slopes / (slopes.abs().max() + 1e-10)
     
     def _calculate_stockout_frequency(self, df: pd.DataFrame) -> pd.Series:
         """
@@ -146,13 +349,14 @@ class InventorySegmentation:
         
         Returns proportion of days with zero sales (proxy for stockouts).
         """
-        stockouts = (df.groupby(['item_id', 'store_id'])['sales'] == 0).groupby(level=[0, 1]).mean()
+        is_zero = pd.Series((df['sales'].to_numpy() == 0).astype(np.float32), index=df.index)
+        stockouts = is_zero.groupby(df['_gid'], sort=False).mean()
         
         return stockouts.fillna(0)
     
     def fit(self, features: pd.DataFrame) -> 'InventorySegmentation':
         """
-        Fit K-means clustering model.
+        Fit mini-batch K-means clustering model.
         
         Parameters
         ----------
@@ -168,22 +372,49 @@ class InventorySegmentation:
         
         self.feature_names = features.columns.tolist()
         
-        # Standardize features
-        features_scaled = self.scaler.fit_transform(features)
-        
-        # Fit K-means
-        self.kmeans = KMeans(
-            n_clusters=self.n_clusters,
-            random_state=self.random_state,
-            n_init=10,
-            max_iter=300
+        if self.use_gpu:
+            import cudf
+            from cuml.cluster import KMeans as CumlKMeans
+            from cuml.preprocessing import StandardScaler as CumlStandardScaler
+            
+            # Standardize and fit full-batch K-means on the GPU
+            gpu_features = cudf.DataFrame.from_pandas(features.astype(np.float32))
+            self.scaler = CumlStandardScaler()
+            gpu_scaled = self.scaler.fit_transform(gpu_features)
+            
+            self.kmeans = CumlKMeans(
+                n_clusters=self.n_clusters,
+                random_state=self.random_state,
+                n_init=3
+            )
+            self.kmeans.fit(gpu_scaled)
+            
+            # Quality metrics are computed on the host
+            features_scaled = gpu_scaled.to_numpy()
+            labels = self.kmeans.labels_.to_numpy()
+        else:
+            # Standardize features (float32 halves memory traffic; the scaler preserves it)
+            features_scaled = self.scaler.fit_transform(features.to_numpy(np.float32, copy=False))
+            
+            # Fit mini-batch K-means
+            self.kmeans = MiniBatchKMeans(
+                n_clusters=self.n_clusters,
+                random_state=self.random_state,
+                n_init=3,
+                batch_size=8192,
+                max_iter=100,
+                reassignment_ratio=0.01
+            )
+            self.kmeans.fit(features_scaled)
+            labels = self.kmeans.labels_
+        
+        # Calculate quality metrics (silhouette is O(N²), so score a 50k sample)
+        silhouette = silhouette_score(
+            features_scaled, labels,
+            sample_size=min(50_000, len(features_scaled)),
+            random_state=self.random_state
         )
-        
-        self.kmeans.fit(features_scaled)
-        
-        # Calculate quality metrics
-        silhouette = silhouette_score(features_scaled, self.kmeans.labels_)
-        davies_bouldin = davies_bouldin_score(features_scaled, self.kmeans.labels_)
+        davies_bouldin = davies_bouldin_score(features_scaled, labels)
         
         logger.info(f"✅ Clustering completed")
         logger.info(f"   Silhouette Score: {silhouette:.3f} (higher is better)")
@@ -205,7 +436,13 @@ class InventorySegmentation:
         np.ndarray
             Cluster assignments
         """
-        features_scaled = self.scaler.transform(features)
+        if self.use_gpu:
+            import cudf
+            
+            gpu_features = cudf.DataFrame.from_pandas(features.astype(np.float32))
+            return self.kmeans.predict(self.scaler.transform(gpu_features)).to_numpy()
+        
+        features_scaled = self.scaler.transform(features.to_numpy(np.float32, copy=False))
         return self.kmeans.predict(features_scaled)
     
     def assign_business_labels(self, features: pd.DataFrame, clusters: np.ndarray) -> pd.Series:
@@ -236,30 +473,25 @@ class InventorySegmentation:
         })
         
         # Assign labels based on characteristics
-        labels = {}
-        
-        for cluster in range(self.n_clusters):
-            stats = cluster_stats.loc[cluster]
-            
-            # Determine label components
-            if stats['revenue_contribution'] > cluster_stats['revenue_contribution'].quantile(0.67):
-                value_label = "Premium"
-            elif stats['revenue_contribution'] > cluster_stats['revenue_contribution'].quantile(0.33):
-                value_label = "Mid-Tier"
-            else:
-                value_label = "Budget"
-            
-            if stats['demand_cv'] < 0.5:
-                stability_label = "Stable"
-            elif stats['demand_cv'] < 1.0:
-                stability_label = "Moderate"
-            else:
-                stability_label = "Volatile"
-            
-            labels[cluster] = f"{value_label}-{stability_label}"
-        
-        # Map clusters to labels
-        label_series = pd.Series(clusters).map(labels)
+        # Value tier: above the 67th percentile of cluster revenue is Premium,
+        # above the 33rd is Mid-Tier, otherwise Budget
+        revenue_cuts = cluster_stats['revenue_contribution'].quantile([0.33, 0.67]).to_numpy()
+        value_labels = np.array(['Budget', 'Mid-Tier', 'Premium'])[
+            np.searchsorted(revenue_cuts, cluster_stats['revenue_contribution'].to_numpy(), side='left')
+        ]
+        
+        # Stability: CV below 0.5 is Stable, below 1.0 is Moderate, otherwise Volatile
+        stability_labels = np.array(['Stable', 'Moderate', 'Volatile'])[
+            np.searchsorted([0.5, 1.0], cluster_stats['demand_cv'].to_numpy(), side='right')
+        ]
+        
+        labels = dict(zip(
+            cluster_stats.index,
+            [f"{value}-{stability}" for value, stability in zip(value_labels, stability_labels)]
+        ))
+        
+        # Map clusters to labels (aligned with the feature rows)
+        label_series = pd.Series(clusters, index=features.index).map(labels)
         
         return label_series
     